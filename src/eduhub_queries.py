@@ -1,21 +1,49 @@
 # eduhub_queries.py
 # MongoDB operations using PyMongo for the EduHub project
 
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, CursorType, ASCENDING, TEXT, InsertOne, UpdateOne, DeleteOne
 from bson.objectid import ObjectId
-from datetime import datetime, timedelta
+from bson.regex import Regex
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from faker import Faker
-import random
+from faker.providers.person.en_US import Provider as PersonProvider
+from numba import njit, prange, float64, int64
+import functools
+import numpy as np
+import os
+import re
 import string
 import time
+import uuid
 
 
 fake = Faker()
 # ========== Part 1: Database Setup and Data Modeling ==========
 
 # Task 1.1: Create Database and Collections
-client = MongoClient("mongodb://localhost:27017/")
-db = client["eduhub_db"]
+# One shared, pooled client per process. get_db() builds it once and returns
+# the same database on later calls; the script below binds `db` at import.
+client = None
+
+def get_db():
+    global client
+    if client is None:
+        client = MongoClient(
+            "mongodb://localhost:27017/",
+            maxPoolSize=200,
+            minPoolSize=20,
+            socketTimeoutMS=5000,
+            serverSelectionTimeoutMS=2000,
+            compressors="zstd,snappy,zlib",
+            zlibCompressionLevel=-1,
+            retryWrites=True,
+            readPreference="primaryPreferred",
+            w=1
+        )
+    return client["eduhub_db"]
+
+db = get_db()
 
 # Task 1.2: Design Document Schemas
 # (Handled by schema validation in MongoDB setup)
@@ -24,128 +52,187 @@ db = client["eduhub_db"]
 
 # Task 2.1: Insert Sample Data
 
+# Columns are generated whole (one list/array per field) and only zipped
+# into per-row documents at the insert boundary
+rng = np.random.default_rng()
+
+# One UTC timestamp shared by every generated document
+generated_at = datetime.now(timezone.utc)
+
+def to_documents(columns):
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+# Numeric columns are filled by compiled helpers; the explicit signatures
+# make Numba compile them eagerly at import instead of on first call
+@njit(float64[:](int64, float64, float64, int64), cache=True, parallel=True)
+def uniform_column(n, low, high, decimals):
+    scale = 10.0 ** decimals
+    out = np.empty(n)
+    for i in prange(n):
+        value = low + (high - low) * np.random.random()
+        out[i] = np.floor(value * scale + 0.5) / scale
+    return out
+
+@njit(int64[:](int64, int64, int64), cache=True, parallel=True)
+def integer_column(n, low, high):
+    out = np.empty(n, dtype=np.int64)
+    for i in prange(n):
+        out[i] = np.random.randint(low, high)
+    return out
+
 # Generate 25 users with a mix of roles (students and instructors)
-users = []
-for i in range(25):
-    role = random.choice(["student", "instructor"])
-    users.append({
-        "userId": f"u{i+1:03}",
-        "email": fake.unique.email(),
-        "firstName": fake.first_name(),
-        "lastName": fake.last_name(),
-        "role": role,
-        "dateJoined": fake.date_time_between(start_date='-2y', end_date='now'),
-        "profile": {
+n_users = 25
+# Name pools taken straight from Faker's en_US word lists
+first_name_pool = np.array(list(PersonProvider.first_names))
+last_name_pool = np.array(list(PersonProvider.last_names))
+skill_pool = ["Python", "JavaScript", "MongoDB", "SQL", "Data Science", "Machine Learning"]
+
+users = to_documents({
+    "userId": [f"u{i+1:03}" for i in range(n_users)],
+    "email": [f"user{i+1:06}@example.com" for i in range(n_users)],  # unique by construction
+    "firstName": rng.choice(first_name_pool, n_users).tolist(),
+    "lastName": rng.choice(last_name_pool, n_users).tolist(),
+    "role": rng.choice(["student", "instructor"], n_users).tolist(),
+    "dateJoined": [fake.date_time_between(start_date='-2y', end_date='now', tzinfo=timezone.utc) for _ in range(n_users)],
+    "profile": [
+        {
             "bio": fake.sentence(),
             "avatar": fake.image_url(),
-            "skills": random.sample(["Python", "JavaScript", "MongoDB", "SQL", "Data Science", "Machine Learning"], k=random.randint(1, 4))
-        },
-        "isActive": True
-    })
-
-db.users.insert_many(users)
+            "skills": rng.choice(skill_pool, k, replace=False).tolist()
+        }
+        for k in rng.integers(1, 5, n_users)
+    ],
+    "isActive": [True] * n_users
+})
 
 
 # Generate 8 courses, each assigned to a random instructor from users
 instructors = [u for u in users if u["role"] == "instructor"]
+instructor_ids = np.array([u["userId"] for u in instructors])
 
 categories = ["Programming", "Data Science", "Design", "Database", "Cybersecurity"]
 levels = ["beginner", "intermediate", "advanced"]
-
-courses = []
-for i in range(8):
-    instructor = random.choice(instructors)
-    courses.append({
-        "courseId": f"c{i+1:03}",
-        "title": fake.sentence(nb_words=4),
-        "description": fake.paragraph(),
-        "instructorId": instructor["userId"],
-        "category": random.choice(categories),
-        "level": random.choice(levels),
-        "duration": round(random.uniform(5, 40), 1),
-        "price": round(random.uniform(10, 100), 2),
-        "tags": random.sample(["Python", "MongoDB", "Cloud", "UX", "Networks"], k=2),
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now(),
-        "isPublished": random.choice([True, False])
-    })
-
-db.courses.insert_many(courses)
+tag_pool = ["Python", "MongoDB", "Cloud", "UX", "Networks"]
+
+n_courses = 8
+courses = to_documents({
+    "courseId": [f"c{i+1:03}" for i in range(n_courses)],
+    "title": [fake.sentence(nb_words=4) for _ in range(n_courses)],
+    "description": [fake.paragraph() for _ in range(n_courses)],
+    "instructorId": instructor_ids[rng.integers(0, len(instructor_ids), n_courses)].tolist(),
+    "category": rng.choice(categories, n_courses).tolist(),
+    "level": rng.choice(levels, n_courses).tolist(),
+    "duration": uniform_column(n_courses, 5.0, 40.0, 1).tolist(),
+    "price": uniform_column(n_courses, 10.0, 100.0, 2).tolist(),
+    "tags": [rng.choice(tag_pool, 2, replace=False).tolist() for _ in range(n_courses)],
+    "createdAt": [generated_at] * n_courses,
+    "updatedAt": [generated_at] * n_courses,
+    "isPublished": rng.choice([True, False], n_courses).tolist()
+})
 
 
 # Generate 15 enrollments linking students to courses with progress info
 students = [u for u in users if u["role"] == "student"]
 
-enrollments = []
-for i in range(15):
-    student = random.choice(students)
-    course = random.choice(courses)
-    enrollments.append({
-        "enrollmentId": f"e{i+1:03}",
-        "studentId": student["userId"],
-        "courseId": course["courseId"],
-        "enrolledAt": fake.date_time_between(start_date='-1y', end_date='now'),
-        "progress": round(random.uniform(0, 100), 2),
-        "completed": random.choice([True, False])
-    })
+# References are drawn as index arrays into these id columns and gathered
+student_ids = np.array([u["userId"] for u in students])
+course_ids = np.array([c["courseId"] for c in courses])
+course_categories = np.array([c["category"] for c in courses])
 
-db.enrollments.insert_many(enrollments)
+n_enrollments = 15
+course_idx = rng.integers(0, len(courses), n_enrollments)
+enrollments = to_documents({
+    "enrollmentId": [f"e{i+1:03}" for i in range(n_enrollments)],
+    "studentId": student_ids[rng.integers(0, len(student_ids), n_enrollments)].tolist(),
+    "courseId": course_ids[course_idx].tolist(),
+    "category": course_categories[course_idx].tolist(),  # denormalized from courses
+    "enrolledAt": [fake.date_time_between(start_date='-1y', end_date='now', tzinfo=timezone.utc) for _ in range(n_enrollments)],
+    "progress": uniform_column(n_enrollments, 0.0, 100.0, 2).tolist(),
+    "completed": rng.choice([True, False], n_enrollments).tolist()
+})
 
 
 # Generate 25 lessons assigned randomly to courses
-lessons = []
-for i in range(25):
-    course = random.choice(courses)
-    lessons.append({
-        "lessonId": f"l{i+1:03}",
-        "courseId": course["courseId"],
-        "title": fake.sentence(nb_words=5),
-        "content": fake.paragraph(nb_sentences=3),
-        "videoUrl": fake.url(),
-        "duration": round(random.uniform(5, 30), 2),  # duration in minutes
-        "order": random.randint(1, 10)
-    })
-
-db.lessons.insert_many(lessons)
+n_lessons = 25
+lessons = to_documents({
+    "lessonId": [f"l{i+1:03}" for i in range(n_lessons)],
+    "courseId": course_ids[rng.integers(0, len(course_ids), n_lessons)].tolist(),
+    "title": [fake.sentence(nb_words=5) for _ in range(n_lessons)],
+    "content": [fake.paragraph(nb_sentences=3) for _ in range(n_lessons)],
+    "videoUrl": [fake.url() for _ in range(n_lessons)],
+    "duration": uniform_column(n_lessons, 5.0, 30.0, 2).tolist(),  # duration in minutes
+    "order": integer_column(n_lessons, 1, 11).tolist()
+})
 
 
 # Generate 10 assignments linked to random courses with due dates
-assignments = []
-for i in range(10):
-    course = random.choice(courses)
-    assignments.append({
-        "assignmentId": f"a{i+1:03}",
-        "courseId": course["courseId"],
-        "title": fake.sentence(),
-        "description": fake.paragraph(),
-        "dueDate": datetime.now() + timedelta(days=random.randint(5, 20))
-    })
-
-db.assignments.insert_many(assignments)
+n_assignments = 10
+assignments = to_documents({
+    "assignmentId": [f"a{i+1:03}" for i in range(n_assignments)],
+    "courseId": course_ids[rng.integers(0, len(course_ids), n_assignments)].tolist(),
+    "title": [fake.sentence() for _ in range(n_assignments)],
+    "description": [fake.paragraph() for _ in range(n_assignments)],
+    "dueDate": [generated_at + timedelta(days=days) for days in rng.integers(5, 21, n_assignments).tolist()]
+})
 
 
 # Generate 12 assignment submissions by students with grades
-submissions = []
-for i in range(12):
-    assignment = random.choice(assignments)
-    student = random.choice(students)
-    submissions.append({
-        "submissionId": f"s{i+1:03}",
-        "assignmentId": assignment["assignmentId"],
-        "studentId": student["userId"],
-        "submittedAt": datetime.now() - timedelta(days=random.randint(0, 10)),
-        "content": fake.text(),
-        "grade": round(random.uniform(0, 100), 2)
-    })
-
-db.submissions.insert_many(submissions)
-
-
+assignment_ids = np.array([a["assignmentId"] for a in assignments])
+
+n_submissions = 12
+submissions = to_documents({
+    "submissionId": [f"s{i+1:03}" for i in range(n_submissions)],
+    "assignmentId": assignment_ids[rng.integers(0, len(assignment_ids), n_submissions)].tolist(),
+    "studentId": student_ids[rng.integers(0, len(student_ids), n_submissions)].tolist(),
+    "submittedAt": [generated_at - timedelta(days=days) for days in rng.integers(0, 11, n_submissions).tolist()],
+    "content": [fake.text() for _ in range(n_submissions)],
+    "grade": uniform_column(n_submissions, 0.0, 100.0, 2).tolist()
+})
+
+
+# Insert all six collections concurrently with unordered bulk writes. Each
+# collection is emptied first so re-running the script replaces the sample
+# rows instead of hitting duplicate-key errors on the unique email index.
+def bulk_insert(collection, documents):
+    collection.delete_many({})
+    return collection.bulk_write(
+        [InsertOne(doc) for doc in documents],
+        ordered=False
+    )
+
+with ThreadPoolExecutor(max_workers=6) as executor:
+    futures = [
+        executor.submit(bulk_insert, db.users, users),
+        executor.submit(bulk_insert, db.courses, courses),
+        executor.submit(bulk_insert, db.enrollments, enrollments),
+        executor.submit(bulk_insert, db.lessons, lessons),
+        executor.submit(bulk_insert, db.assignments, assignments),
+        executor.submit(bulk_insert, db.submissions, submissions),
+    ]
+    for future in futures:
+        future.result()
 
 
 # Task 2.2: Data Relationships
 # (Assured during data insertion using reference fields)
 
+# Enrollments carry a copy of their course's category so category reports
+# don't need a $lookup. Backfill it once for rows inserted before that.
+def backfill_enrollment_categories():
+    db.enrollments.aggregate([
+        {"$match": {"category": {"$exists": False}}},
+        {"$lookup": {
+            "from": "courses",
+            "localField": "courseId",
+            "foreignField": "courseId",
+            "as": "course"
+        }},
+        {"$unwind": "$course"},
+        {"$project": {"category": "$course.category"}},
+        {"$merge": {"into": "enrollments", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ])
+
 # ========== Part 3: Basic CRUD Operations ==========
 
 # Task 3.1: Create Operations
@@ -157,6 +244,11 @@ def create_course(course):
     return db.courses.insert_one(course)
 
 def enroll_student(enrollment):
+    if "category" not in enrollment:
+        course = db.courses.find_one({"courseId": enrollment["courseId"]}, {"category": 1})
+        if course is None:
+            raise ValueError(f"Unknown course: {enrollment['courseId']}")
+        enrollment = {**enrollment, "category": course["category"]}
     return db.enrollments.insert_one(enrollment)
 
 def add_lesson_to_course(lesson):
@@ -164,8 +256,19 @@ def add_lesson_to_course(lesson):
 
 # Task 3.2: Read Operations
 
+# Read helpers return summary fields only and give up after FIND_MAX_TIME_MS.
+# They drain their cursor straight into a list, so they use exhaust cursors
+# to let the server stream every batch without waiting for getMore.
+USER_FIELDS = {"userId": 1, "email": 1, "firstName": 1, "lastName": 1, "_id": 0}
+RECENT_USER_FIELDS = {**USER_FIELDS, "dateJoined": 1}
+COURSE_FIELDS = {"courseId": 1, "title": 1, "instructorId": 1, "category": 1, "level": 1, "price": 1, "tags": 1, "_id": 0}
+ASSIGNMENT_FIELDS = {"assignmentId": 1, "courseId": 1, "title": 1, "dueDate": 1, "_id": 0}
+FIND_MAX_TIME_MS = 2000
+FIND_BATCH_SIZE = 500
+
 def get_active_students():
-    return list(db.users.find({"role": "student", "isActive": True}))
+    cursor = db.users.find({"role": "student", "isActive": True}, USER_FIELDS, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(FIND_MAX_TIME_MS).batch_size(FIND_BATCH_SIZE))
 
 def get_course_with_instructor(course_id):
     return db.courses.aggregate([
@@ -176,10 +279,11 @@ def get_course_with_instructor(course_id):
             "foreignField": "userId",
             "as": "instructor"
         }}
-    ])
+    ], hint="courseId_1", allowDiskUse=False, batchSize=1000)
 
 def get_courses_by_category(category):
-    return list(db.courses.find({"category": category}))
+    cursor = db.courses.find({"category": category}, COURSE_FIELDS, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(FIND_MAX_TIME_MS).batch_size(FIND_BATCH_SIZE))
 
 def get_students_in_course(course_id):
     return db.enrollments.aggregate([
@@ -190,117 +294,184 @@ def get_students_in_course(course_id):
             "foreignField": "userId",
             "as": "student"
         }}
-    ])
+    ], hint="courseId_1", allowDiskUse=False, batchSize=1000)
 
 def search_courses_by_title(title_fragment):
-    return list(db.courses.find({"title": {"$regex": title_fragment, "$options": "i"}}))
+    # Served by the text index on title; an unanchored regex would scan every course
+    cursor = db.courses.find({"$text": {"$search": title_fragment}}, COURSE_FIELDS, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(1000).batch_size(FIND_BATCH_SIZE))
 
-# Task 3.3: Update Operations
+# Compiled, anchored and escaped once per distinct prefix. The match is
+# case-sensitive so the title index can bound the scan to the prefix range.
+@functools.lru_cache(maxsize=512)
+def title_prefix_pattern(prefix):
+    return Regex("^" + re.escape(prefix))
 
-def update_user_profile(user_id, update_fields):
-    return db.users.update_one({"userId": user_id}, {"$set": update_fields})
+def search_courses_by_title_prefix(prefix):
+    cursor = db.courses.find({"title": title_prefix_pattern(prefix)}, COURSE_FIELDS, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(1000).batch_size(FIND_BATCH_SIZE))
 
-def mark_course_published(course_id):
-    return db.courses.update_one({"courseId": course_id}, {"$set": {"isPublished": True}})
-
-def update_assignment_grade(submission_id, grade):
-    return db.assignment_submissions.update_one({"_id": ObjectId(submission_id)}, {"$set": {"grade": grade}})
+# Task 3.3: Update Operations
 
-def add_tags_to_course(course_id, tags):
-    return db.courses.update_one({"courseId": course_id}, {"$addToSet": {"tags": {"$each": tags}}})
+# Queues write operations and sends them in one unordered bulk_write per
+# `size` ops. Pass one to the helpers below to batch many updates/deletes;
+# without it each helper issues its own round-trip.
+class BulkBatcher:
+    def __init__(self, collection, size=500):
+        self.collection = collection
+        self.size = size
+        self.ops = []
+
+    def add(self, op, collection=None):
+        if collection is not None and collection != self.collection:
+            raise ValueError(
+                f"Batcher for {self.collection.name} cannot queue writes for {collection.name}"
+            )
+        self.ops.append(op)
+        if len(self.ops) >= self.size:
+            return self.flush()
+
+    def flush(self):
+        if not self.ops:
+            return None
+        ops, self.ops = self.ops, []
+        return self.collection.bulk_write(ops, ordered=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Don't send queued writes if the block that built them failed
+        if exc_type is None:
+            self.flush()
+
+# Accept an ObjectId as-is so loops that already hold parsed ids skip re-parsing
+def as_object_id(value):
+    return value if isinstance(value, ObjectId) else ObjectId(value)
+
+def apply_update(collection, query, update, batcher=None):
+    if batcher is not None:
+        return batcher.add(UpdateOne(query, update), collection)
+    return collection.update_one(query, update)
+
+def apply_delete(collection, query, batcher=None):
+    if batcher is not None:
+        return batcher.add(DeleteOne(query), collection)
+    return collection.delete_one(query)
+
+def update_user_profile(user_id, update_fields, batcher=None):
+    return apply_update(db.users, {"userId": user_id}, {"$set": update_fields}, batcher)
+
+def mark_course_published(course_id, batcher=None):
+    return apply_update(db.courses, {"courseId": course_id}, {"$set": {"isPublished": True}}, batcher)
+
+def update_assignment_grade(submission_id, grade, batcher=None):
+    return apply_update(db.assignment_submissions, {"_id": as_object_id(submission_id)}, {"$set": {"grade": grade}}, batcher)
+
+def add_tags_to_course(course_id, tags, batcher=None):
+    return apply_update(db.courses, {"courseId": course_id}, {"$addToSet": {"tags": {"$each": tags}}}, batcher)
 
 # Task 3.4: Delete Operations
 
-def soft_delete_user(user_id):
-    return db.users.update_one({"userId": user_id}, {"$set": {"isActive": False}})
+def soft_delete_user(user_id, batcher=None):
+    return apply_update(db.users, {"userId": user_id}, {"$set": {"isActive": False}}, batcher)
 
-def delete_enrollment(enrollment_id):
-    return db.enrollments.delete_one({"_id": ObjectId(enrollment_id)})
+def delete_enrollment(enrollment_id, batcher=None):
+    return apply_delete(db.enrollments, {"_id": as_object_id(enrollment_id)}, batcher)
 
-def remove_lesson(lesson_id):
-    return db.lessons.delete_one({"_id": ObjectId(lesson_id)})
+def remove_lesson(lesson_id, batcher=None):
+    return apply_delete(db.lessons, {"_id": as_object_id(lesson_id)}, batcher)
+
+def delete_enrollments_bulk(enrollment_ids):
+    ids = [as_object_id(enrollment_id) for enrollment_id in enrollment_ids]
+    return db.enrollments.delete_many({"_id": {"$in": ids}})
 
 # ========== Part 4: Advanced Queries and Aggregation ==========
 
 # Task 4.1: Complex Queries
 
 def find_courses_in_price_range():
-    return list(db.courses.find({"price": {"$gte": 50, "$lte": 200}}))
+    cursor = db.courses.find({"price": {"$gte": 50, "$lte": 200}}, COURSE_FIELDS, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(FIND_MAX_TIME_MS).batch_size(FIND_BATCH_SIZE))
 
 def recent_users():
-    six_months_ago = datetime.now() - timedelta(days=180)
-    return list(db.users.find({"dateJoined": {"$gte": six_months_ago}}))
+    six_months_ago = datetime.now(timezone.utc) - timedelta(days=180)
+    cursor = db.users.find({"dateJoined": {"$gte": six_months_ago}}, RECENT_USER_FIELDS, cursor_type=CursorType.EXHAUST).hint("dateJoined_1")
+    return list(cursor.max_time_ms(FIND_MAX_TIME_MS).batch_size(FIND_BATCH_SIZE))
 
 def find_courses_with_tags(tags):
-    return list(db.courses.find({"tags": {"$in": tags}}))
+    cursor = db.courses.find({"tags": {"$in": tags}}, COURSE_FIELDS, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(FIND_MAX_TIME_MS).batch_size(FIND_BATCH_SIZE))
 
 def assignments_due_next_week():
-    now = datetime.now()
+    now = datetime.now(timezone.utc)
     next_week = now + timedelta(days=7)
-    return list(db.assignments.find({"dueDate": {"$gte": now, "$lte": next_week}}))
+    cursor = db.assignments.find({"dueDate": {"$gte": now, "$lte": next_week}}, ASSIGNMENT_FIELDS, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(FIND_MAX_TIME_MS).batch_size(FIND_BATCH_SIZE))
 
 # Task 4.2: Aggregation Pipeline
 
-# Count total enrollments per course
-db.enrollments.aggregate([
-    {"$group": {"_id": "$courseId", "totalEnrollments": {"$sum": 1}}}
-])
+# Count total enrollments and completion rate (average progress) per course.
+# Rolled up into course_stats so readers do a single _id lookup instead of
+# scanning enrollments. $out rebuilds the collection and swaps it in
+# atomically, so readers never see a half-written report and courses that
+# lost all their enrollments drop out. Call refresh_course_stats() on a
+# schedule (e.g. nightly) or run watch_enrollments() to rebuild on change.
+def refresh_course_stats():
+    db.enrollments.aggregate([
+        {"$group": {
+            "_id": "$courseId",
+            "totalEnrollments": {"$sum": 1},
+            "avgProgress": {"$avg": "$progress"}  # Assuming progress is from 0 to 100
+        }},
+        {"$out": "course_stats"}
+    ])
+
+def get_course_stats(course_id):
+    return db.course_stats.find_one({"_id": course_id})
+
+def get_enrollments_per_course():
+    cursor = db.course_stats.find({}, {"_id": 1, "totalEnrollments": 1}, cursor_type=CursorType.EXHAUST)
+    return list(cursor.max_time_ms(FIND_MAX_TIME_MS).batch_size(FIND_BATCH_SIZE))
+
+# Blocks and rebuilds course_stats as enrollments change (needs a replica set).
+# A burst of writes is drained first so it costs one rebuild, not one per event.
+def watch_enrollments():
+    with db.enrollments.watch(max_await_time_ms=500) as stream:
+        for _ in stream:
+            while stream.try_next() is not None:
+                pass
+            refresh_course_stats()
+
+refresh_course_stats()
 
 # Calculate average course rating
 db.courses.aggregate([
     {"$match": {"rating": {"$exists": True}}},
     {"$group": {"_id": "$courseId", "avgRating": {"$avg": "$rating"}}}
-])
+], allowDiskUse=False)
 
 # Group by course category
 db.courses.aggregate([
     {"$group": {"_id": "$category", "totalCourses": {"$sum": 1}}}
-])
+], allowDiskUse=False)
 
 # Average grade per student
 db.submissions.aggregate([
     {"$group": {"_id": "$studentId", "averageGrade": {"$avg": "$grade"}}}
-])
-
-# Completion rate by course
-db.enrollments.aggregate([
-    {"$group": {
-        "_id": "$courseId",
-        "avgProgress": {"$avg": "$progress"}  # Assuming progress is from 0 to 100
-    }}
-])
+], allowDiskUse=False)
 
 # Top-performing students (e.g., avg grade ≥ 90)
 db.submissions.aggregate([
     {"$group": {"_id": "$studentId", "averageGrade": {"$avg": "$grade"}}},
     {"$match": {"averageGrade": {"$gte": 90}}},
-    {"$sort": {"averageGrade": -1}}
-])
+    # Keep $sort and $limit adjacent (no $project between) so the server does a top-K sort
+    {"$sort": {"averageGrade": -1}},
+    {"$limit": 10}
+], allowDiskUse=False)
 
-# Total students taught by each instructor
-db.courses.aggregate([
-    {"$lookup": {
-        "from": "enrollments",
-        "localField": "courseId",
-        "foreignField": "courseId",
-        "as": "course_enrollments"
-    }},
-    {"$group": {
-        "_id": "$instructorId",
-        "totalStudents": {"$sum": {"$size": "$course_enrollments"}}
-    }}
-])
-
-# Average course rating per instructor
-db.courses.aggregate([
-    {"$match": {"rating": {"$exists": True}}},
-    {"$group": {
-        "_id": "$instructorId",
-        "averageRating": {"$avg": "$rating"}
-    }}
-])
-
-# Revenue generated per instructor
+# Total students, average course rating and revenue per instructor
+# (one pipeline so the enrollments lookup runs once instead of per metric)
 db.courses.aggregate([
     {"$lookup": {
         "from": "enrollments",
@@ -308,65 +479,174 @@ db.courses.aggregate([
         "foreignField": "courseId",
         "as": "enrolls"
     }},
-    {"$project": {
-        "instructorId": 1,
-        "revenue": {"$multiply": [{"$size": "$enrolls"}, "$price"]}
-    }},
     {"$group": {
         "_id": "$instructorId",
-        "totalRevenue": {"$sum": "$revenue"}
+        "totalStudents": {"$sum": {"$size": "$enrolls"}},
+        "averageRating": {"$avg": "$rating"},  # $avg skips courses without a rating
+        "totalRevenue": {"$sum": {"$multiply": [{"$size": "$enrolls"}, "$price"]}}
     }}
-])
+], allowDiskUse=False)
 
 # Monthly enrollment trends
 db.enrollments.aggregate([
     {"$group": {
-        "_id": {"$dateToString": {"format": "%Y-%m", "date": "$enrollmentDate"}},
+        "_id": {"$dateToString": {"format": "%Y-%m", "date": "$enrolledAt"}},
         "totalEnrollments": {"$sum": 1}
     }},
     {"$sort": {"_id": 1}}
-])
+], allowDiskUse=False)
 
-# Most popular course categories
+# Most popular course categories (uses the category copied onto each enrollment)
 db.enrollments.aggregate([
-    {"$lookup": {
-        "from": "courses",
-        "localField": "courseId",
-        "foreignField": "courseId",
-        "as": "course"
-    }},
-    {"$unwind": "$course"},
-    {"$group": {"_id": "$course.category", "total": {"$sum": 1}}},
+    {"$group": {"_id": "$category", "total": {"$sum": 1}}},
     {"$sort": {"total": -1}}
-])
+], allowDiskUse=False)
 
 # Student engagement metrics (average progress per course)
-db.enrollments.aggregate([
-    {"$group": {
-        "_id": "$courseId",
-        "avgProgress": {"$avg": "$progress"}
-    }}
-])
+# (precomputed in course_stats, see refresh_course_stats above)
 
 
 # ========== Part 5: Indexing and Performance ==========
 
 # Task 5.1: Index Creation
 
+# A collection can only have one text index, and the notebook builds
+# (title text, category 1) on the same database. Reuse any text index that
+# starts with its text key and covers title; replace any other one.
+def ensure_title_text_index():
+    for name, info in db.courses.index_information().items():
+        if "weights" not in info:
+            continue
+        if "title" in info["weights"] and info["key"][0][0] == "_fts":
+            return
+        db.courses.drop_index(name)
+    db.courses.create_index([("title", TEXT)])
+
 def create_indexes():
+    # Each index matches the predicate of a Part 3/4 query
     db.users.create_index("email", unique=True)
-    db.courses.create_index([("title", ASCENDING), ("category", ASCENDING)])
+    db.users.create_index(
+        [("role", ASCENDING), ("isActive", ASCENDING)],
+        partialFilterExpression={"isActive": True}
+    )  # get_active_students
+    db.users.create_index("dateJoined")  # recent_users
+    db.courses.create_index("courseId")  # get_course_with_instructor
+    ensure_title_text_index()  # search_courses_by_title
+    db.courses.create_index("title")  # search_courses_by_title_prefix
+    db.courses.create_index("category")  # get_courses_by_category
+    db.courses.create_index("price")  # find_courses_in_price_range
+    db.courses.create_index("tags")  # find_courses_with_tags (multikey)
     db.assignments.create_index("dueDate")
     db.enrollments.create_index([("studentId", ASCENDING), ("courseId", ASCENDING)])
+    db.enrollments.create_index("courseId")  # get_students_in_course
+    db.enrollments.create_index("category")
+    db.enrollments.create_index("enrolledAt")
+
+# Build indexes after the bulk load so inserts skip index maintenance
+create_indexes()
 
 # Task 5.2: Query Optimization
 
-def explain_and_time(query_func):
-    start = time.time()
-    explanation = query_func().explain()
-    end = time.time()
-    print("Execution Time: {:.4f} seconds".format(end - start))
-    return explanation
+# The profiler records the plan each slow operation actually ran with, so
+# a timed query does not need an extra explain() to re-plan it. Turning it
+# on changes the server-wide slowms, so it is opt-in (EDUHUB_DEBUG below).
+PROFILE_SLOW_MS = 50
+profiling_enabled = False
+
+def enable_profiling(slow_ms=PROFILE_SLOW_MS):
+    global profiling_enabled
+    db.command("profile", 1, slowms=slow_ms)
+    profiling_enabled = True
+
+EXPLAIN_CACHE_SIZE = 128
+explain_cache = {}
+
+def profiled_op(collection, comment):
+    return db.system.profile.find_one(
+        {"ns": collection.full_name, "command.comment": comment},
+        sort=[("$natural", -1)]
+    )
+
+def cache_explain(query_key, explanation):
+    if len(explain_cache) >= EXPLAIN_CACHE_SIZE:
+        explain_cache.pop(next(iter(explain_cache)))
+    explain_cache[query_key] = explanation
+
+def elapsed_ms_since(start):
+    return (time.perf_counter_ns() - start) / 1_000_000
+
+# query_func must return a find() cursor. Returns {"executionTimeMs", "source",
+# "plan"}, where source is "profile" for the plan the server actually ran
+# (profiling on and the op was slow) or "explain" for an explain() document.
+# API change: this used to return the bare explain() document, which callers
+# now find under result["plan"].
+#
+# Without a query_key the query is run once, by timing its explain(). With a
+# query_key the real query is timed instead, when its plan can come from the
+# profiler or from the explain() cached for that key.
+def explain_and_time(query_func, query_key=None):
+    elapsed_ms = None
+    if query_key is not None and (profiling_enabled or query_key in explain_cache):
+        # Run the real query once, tagged so its profiler entry can be found
+        comment = f"explain_and_time:{uuid.uuid4().hex}"
+        cursor = query_func().comment(comment)
+        start = time.perf_counter_ns()
+        for _ in cursor:
+            pass
+        elapsed_ms = elapsed_ms_since(start)
+        op = profiled_op(cursor.collection, comment) if profiling_enabled else None
+        if op is not None:
+            source, plan = "profile", op
+        elif query_key in explain_cache:
+            source, plan = "explain", explain_cache[query_key]
+        else:
+            source, plan = "explain", query_func().explain()
+            cache_explain(query_key, plan)
+    else:
+        # explain() executes the query too, so time it instead of a second run
+        start = time.perf_counter_ns()
+        plan = query_func().explain()
+        elapsed_ms = elapsed_ms_since(start)
+        source = "explain"
+        if query_key is not None:
+            cache_explain(query_key, plan)
+    print("Execution Time: {:.3f} ms".format(elapsed_ms))
+    return {"executionTimeMs": elapsed_ms, "source": source, "plan": plan}
+
+# Aggregations that lead with a $match are run with an index hint; with
+# EDUHUB_DEBUG set, check at startup that the planner picks that index on
+# its own, so the hints only pin a plan rather than overrule a better one
+def explain_aggregate(collection, pipeline):
+    return db.command(
+        "explain",
+        {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}},
+        verbosity="queryPlanner"
+    )
+
+def winning_plan_leaf(explanation):
+    # A pipeline pushed down entirely into the query layer reports its plan at
+    # the top level; otherwise it sits under the first ($cursor) stage
+    planner = explanation.get("queryPlanner") or explanation["stages"][0]["$cursor"]["queryPlanner"]
+    plan = planner["winningPlan"]
+    plan = plan.get("queryPlan", plan)  # slot-based engine wraps the classic plan
+    while "inputStage" in plan:
+        plan = plan["inputStage"]
+    return plan
+
+def check_index_plans():
+    sample_course_id = courses[0]["courseId"]
+    for collection, index_name in [(db.courses, "courseId_1"), (db.enrollments, "courseId_1")]:
+        explanation = explain_aggregate(collection, [{"$match": {"courseId": sample_course_id}}])
+        leaf = winning_plan_leaf(explanation)
+        if leaf.get("stage") != "IXSCAN" or leaf.get("indexName") != index_name:
+            raise RuntimeError(
+                f"{collection.name} aggregation planned {leaf.get('stage')} "
+                f"on {leaf.get('indexName')}, expected IXSCAN on {index_name}"
+            )
+
+if os.environ.get("EDUHUB_DEBUG"):
+    enable_profiling()
+    check_index_plans()
 
 # ========== Part 6: Data Validation and Error Handling ==========
 